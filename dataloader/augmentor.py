@@ -1,7 +1,7 @@
 import numpy as np
 import random
 import math
-from PIL import Image
+from concurrent.futures import ThreadPoolExecutor
 
 import cv2
 cv2.setNumThreads(0)
@@ -9,47 +9,156 @@ cv2.ocl.setUseOpenCL(False)
 
 import torch
 import torch.nn.functional as F
+import torchvision.transforms.functional as TF
 from torchvision.transforms import ColorJitter
-from scipy.interpolate import griddata
+from scipy import ndimage
+
+_cv2_fp16_warp = None
+
+def _cv2_supports_fp16_warp():
+    """ Whether this OpenCV build can warp CV_16F images """
+    global _cv2_fp16_warp
+    if _cv2_fp16_warp is None:
+        try:
+            cv2.warpAffine(np.zeros((4, 4), np.float16),
+                           np.eye(2, 3, dtype=np.float32), (4, 4))
+            _cv2_fp16_warp = True
+        except cv2.error:
+            _cv2_fp16_warp = False
+    return _cv2_fp16_warp
+
+def _fill_holes(image, valid_mask):
+    """
+    Fill invalid pixels with their nearest valid pixel.
+
+    Args:
+        image (np.ndarray): 2D or 3D float array.
+        valid_mask (np.ndarray): HxW bool mask, True = valid.
+
+    Returns:
+        np.ndarray: Image with holes filled.
+    """
+    if not valid_mask.any():
+        filled = image.copy()
+        filled[:] = 0
+        return filled
+    # the distance transform hands back, for every invalid pixel, the index
+    # of its nearest valid pixel in two separable O(N) passes
+    inds = ndimage.distance_transform_edt(
+        ~valid_mask, return_indices=True)[1]
+    return image[tuple(inds)]
+
+def _apply_color_jitter(photo_aug, images):
+    """
+    Apply one color jitter sampled from photo_aug to a CHW / NCHW float
+    tensor in [0, 1]. The jitter is written back in place, so views into a
+    larger stack are updated through their storage.
+    """
+    fn_idx, brightness, contrast, saturation, hue = ColorJitter.get_params(
+        photo_aug.brightness, photo_aug.contrast,
+        photo_aug.saturation, photo_aug.hue)
+    for fn_id in fn_idx:
+        if fn_id == 0 and brightness is not None:
+            images.mul_(brightness).clamp_(0, 1)
+        elif fn_id == 1 and contrast is not None:
+            mean = TF.rgb_to_grayscale(images).mean(dim=(-3, -2, -1), keepdim=True)
+            images.sub_(mean).mul_(contrast).add_(mean).clamp_(0, 1)
+        elif fn_id == 2 and saturation is not None:
+            gray = TF.rgb_to_grayscale(images)
+            images.sub_(gray).mul_(saturation).add_(gray).clamp_(0, 1)
+        elif fn_id == 3 and hue is not None:
+            images.copy_(TF.adjust_hue(images, hue))
+    return images
+
+_gpu_photo_aug = None
+
+def gpu_color_transform(img1, img2, asymmetric_prob=0.2):
+    """
+    Batched photometric augmentation for gpu_color mode.
+
+    Applies the same color jitter as FlowAugmentor.color_transform, but on
+    the Bx3xHxW float [0, 255] batches in the training loop after the
+    CPU->GPU transfer, so the dataloader workers skip the jitter entirely.
+    Parameters are sampled once per batch (per frame for the asymmetric
+    case) instead of once per sample.
+    """
+    global _gpu_photo_aug
+    if _gpu_photo_aug is None:
+        _gpu_photo_aug = ColorJitter(brightness=0.4, contrast=0.4, saturation=0.4, hue=0.5/3.14)
+    batch = img1.shape[0]
+    # torchvision's float path expects values in [0, 1]
+    image_stack = torch.cat([img1, img2], dim=0) / 255.0
+    # asymmetric: jitter each frame in place through its view of the stack
+    if torch.rand(()) < asymmetric_prob:
+        _apply_color_jitter(_gpu_photo_aug, image_stack[:batch])
+        _apply_color_jitter(_gpu_photo_aug, image_stack[batch:])
+    # symmetric
+    else:
+        _apply_color_jitter(_gpu_photo_aug, image_stack)
+    image_stack = image_stack.mul_(255.0)
+    return image_stack[:batch], image_stack[batch:]
 
 def interpolate_holes_numpy(image, valid_mask):
     """
-    Interpolate black holes in a NumPy image using linear interpolation.
-    
+    Fill black holes in a NumPy image using cv2.inpaint.
+
     Args:
         image (np.ndarray): 2D or 3D NumPy array representing the image.
         valid_mask (np.ndarray): 2D binary mask, 1 = valid, 0 = invalid.
-    
+
     Returns:
-        np.ndarray: Image with holes interpolated.
+        np.ndarray: Image with holes filled.
     """
+    is_uint8 = image.dtype == np.uint8
     # Ensure image is float
     image = image.astype(np.float32)
     valid_mask = valid_mask.astype(bool)
-    
-    # Create mesh grid of coordinates
-    grid_y, grid_x = np.mgrid[0:image.shape[0], 0:image.shape[1]]
-    
-    # Get valid coordinates and corresponding values
-    valid_coords = np.stack((grid_y[valid_mask], grid_x[valid_mask]), axis=-1)
-    valid_values = image[valid_mask]
-    
-    # Get coordinates of invalid pixels
-    invalid_coords = np.stack((grid_y[~valid_mask], grid_x[~valid_mask]), axis=-1)
-    
-    # Perform interpolation
-    interpolated_values = griddata(
-        valid_coords, valid_values, invalid_coords, method='linear'
-    )
-    
-    # Fill the invalid pixels in the image
+    if valid_mask.all():
+        return image
+
+    # float data (e.g. flow) is filled without the lossy 8-bit quantization
+    # that cv2.inpaint requires
+    if not is_uint8:
+        return _fill_holes(image, valid_mask)
+
+    hole_mask = ~valid_mask
+    hole_mask_u8 = hole_mask.astype(np.uint8)
     interpolated_image = image.copy()
-    interpolated_image[~valid_mask] = interpolated_values
-    interpolated_image[np.isnan(interpolated_image)] = 0
+    # cv2.inpaint only handles 8-bit images, so quantize each channel to the
+    # range spanned by its valid pixels and dequantize the filled holes
+    planes = interpolated_image[..., None] if image.ndim == 2 else interpolated_image
+    for c in range(planes.shape[-1]):
+        plane = planes[..., c]
+        lo = plane[valid_mask].min()
+        hi = plane[valid_mask].max()
+        scale = (hi - lo) / 255.0 if hi > lo else 1.0
+        plane_u8 = np.clip((plane - lo) / scale, 0, 255).astype(np.uint8)
+        plane_u8 = cv2.inpaint(plane_u8, hole_mask_u8, 3, cv2.INPAINT_TELEA)
+        plane[hole_mask] = plane_u8[hole_mask].astype(np.float32) * scale + lo
     return interpolated_image
 
+class _Scratch:
+    """
+    Reusable buffers keyed on (name, shape, dtype), allocated once per
+    dataloader worker instead of once per call.
+
+    Only intermediates may live here: anything the augmentor returns (or
+    that a returned tensor aliases) must be freshly allocated, since the
+    buffers are overwritten on the next call.
+    """
+    def __init__(self):
+        self._buffers = {}
+
+    def get(self, name, shape, dtype):
+        key = (name, tuple(shape), np.dtype(dtype).str)
+        buf = self._buffers.get(key)
+        if buf is None:
+            buf = np.empty(shape, dtype)
+            self._buffers[key] = buf
+        return buf
+
 class FlowAugmentor:
-    def __init__(self, crop_size, min_scale=-0.2, max_scale=0.5, do_flip=True, args=None):
+    def __init__(self, crop_size, min_scale=-0.2, max_scale=0.5, do_flip=True, gpu_color=False, args=None):
         # spatial augmentation params
         self.crop_size = crop_size
         self.min_scale = min_scale
@@ -67,32 +176,76 @@ class FlowAugmentor:
         self.photo_aug = ColorJitter(brightness=0.4, contrast=0.4, saturation=0.4, hue=0.5/3.14)
         self.asymmetric_color_aug_prob = 0.2
         self.eraser_aug_prob = 0.5
+        # when set, the training loop runs gpu_color_transform on the batch
+        # and the workers skip the CPU jitter
+        self.gpu_color = gpu_color
+
+        # created lazily so each dataloader worker gets its own stream
+        self.rng = None
+        # created lazily so the executor thread belongs to the worker process
+        self._pool = None
+        # filled lazily, so each forked worker grows its own buffers
+        self._scratch = _Scratch()
+
+    def _init_rng(self):
+        # torch.initial_seed() differs per dataloader worker, so seeding from
+        # it keeps the PCG64 streams independent after the workers fork
+        self.rng = np.random.default_rng(torch.initial_seed() % (2 ** 32))
+
+    def _sample_eraser_boxes(self, ht, wd):
+        """ Draw the eraser decision and box coordinates for one sample """
+        boxes = []
+        if self.rng.random() < self.eraser_aug_prob:
+            for _ in range(self.rng.integers(1, 3)):
+                x0 = self.rng.integers(0, wd)
+                y0 = self.rng.integers(0, ht)
+                dx = self.rng.integers(50, 100)
+                dy = self.rng.integers(50, 100)
+                boxes.append((x0, y0, dx, dy))
+        return boxes
 
-    def eraser_transform(self, img1, img2):
-        ht, wd = img1.shape[:2]
-        if np.random.rand() < self.eraser_aug_prob:
-            mean_color = np.mean(img2.reshape(-1, 3), axis=0)
-            for _ in range(np.random.randint(1, 3)):
-                x0 = np.random.randint(0, wd)
-                y0 = np.random.randint(0, ht)
-                dx = np.random.randint(50, 100)
-                dy = np.random.randint(50, 100)
+    def eraser_transform(self, img1, img2, boxes=None):
+        if boxes is None:
+            boxes = self._sample_eraser_boxes(*img1.shape[:2])
+        if boxes:
+            # a stride-16 subsample is plenty to estimate the fill color and
+            # touches 256x fewer pixels than a full-image mean
+            mean_color = img2[::16, ::16].reshape(-1, 3).mean(axis=0)
+            for x0, y0, dx, dy in boxes:
                 img2[y0:y0+dy, x0:x0+dx, :] = mean_color
 
         return img1, img2
-        
-    def color_transform(self, img1, img2):
+
+    def _apply_color_jitter(self, images):
+        """ Apply one sampled color jitter to a CHW / NCHW uint8 tensor """
+        return _apply_color_jitter(self.photo_aug, images)
+
+    def color_transform(self, img1, img2, asymmetric=None):
         """ Photometric augmentation """
-        # asymmetric
-        if np.random.rand() < self.asymmetric_color_aug_prob:
-            img1 = np.array(self.photo_aug(Image.fromarray(img1)), dtype=np.uint8)
-            img2 = np.array(self.photo_aug(Image.fromarray(img2)), dtype=np.uint8)
+        if asymmetric is None:
+            asymmetric = self.rng.random() < self.asymmetric_color_aug_prob
+        image_stack = torch.from_numpy(np.stack([img1, img2])).permute(0, 3, 1, 2)
+        image_stack = image_stack.float().div_(255.0)
+        # asymmetric: jitter each frame in place through its view of the stack
+        if asymmetric:
+            self._apply_color_jitter(image_stack[0])
+            self._apply_color_jitter(image_stack[1])
         # symmetric
         else:
-            image_stack = np.concatenate([img1, img2], axis=0)
-            image_stack = np.array(self.photo_aug(Image.fromarray(image_stack)), dtype=np.uint8)
-            img1, img2 = np.split(image_stack, 2, axis=0)
+            self._apply_color_jitter(image_stack)
+        image_stack = image_stack.mul_(255.0).to(torch.uint8)
+        image_stack = image_stack.permute(0, 2, 3, 1).contiguous().numpy()
+        return image_stack[0], image_stack[1]
 
+    def _photometric_transform(self, img1, img2, asymmetric, eraser_boxes):
+        """
+        Color jitter and eraser, which only touch the images. Runs on the
+        worker's background thread while the caller processes flow/valid;
+        every numpy RNG decision was drawn by the caller beforehand.
+        """
+        if asymmetric is not None:
+            img1, img2 = self.color_transform(img1, img2, asymmetric)
+        img1, img2 = self.eraser_transform(img1, img2, eraser_boxes)
         return img1, img2
 
     # def resize_flow_map(self, flow, valid, fx=1.0, fy=1.0):
@@ -129,85 +282,237 @@ class FlowAugmentor:
 
     #     return flow_img, valid_img
 
-    def spatial_transform(self, img1, img2, flow, valid):
-        pad_t = 0
-        pad_b = 0
-        pad_l = 0
-        pad_r = 0
-        if self.crop_size[0] > img1.shape[0]:
-            pad_b = self.crop_size[0] - img1.shape[0]
-        if self.crop_size[1] > img1.shape[1]:
-            pad_r = self.crop_size[1] - img1.shape[1]
-            
-        if pad_b != 0 or pad_r != 0:
-            img1 = np.pad(img1, ((pad_t, pad_b), (pad_l, pad_r), (0, 0)), 'constant', constant_values=((0, 0), (0, 0), (0, 0)))
-            img2 = np.pad(img2, ((pad_t, pad_b), (pad_l, pad_r), (0, 0)), 'constant', constant_values=((0, 0), (0, 0), (0, 0)))
-            flow = np.pad(flow, ((pad_t, pad_b), (pad_l, pad_r), (0, 0)), 'constant', constant_values=((0, 0), (0, 0), (0, 0)))
-            valid = np.pad(valid, ((pad_t, pad_b), (pad_l, pad_r)), 'constant', constant_values=((0, 0), (0, 0)))
-        
+    def _sample_spatial_params(self, ht, wd):
+        """
+        Draw every spatial augmentation decision for one ht x wd sample.
+        All numpy RNG happens here, on the calling thread, so the apply
+        steps below are free of shared random state.
+        """
+        # size after zero-padding up to the crop size; the warp path never
+        # materializes the pad, its constant border plays the same role
+        pad_ht = max(ht, self.crop_size[0])
+        pad_wd = max(wd, self.crop_size[1])
+
         # randomly sample scale
-        ht, wd = img1.shape[:2]
         min_scale = np.maximum(
-            (self.crop_size[0] + 1) / float(ht), 
-            (self.crop_size[1] + 1) / float(wd))
+            (self.crop_size[0] + 1) / float(pad_ht),
+            (self.crop_size[1] + 1) / float(pad_wd))
 
-        scale = 2 ** np.random.uniform(self.min_scale, self.max_scale)
+        # one batched draw covers the stretch/spatial/flip decisions
+        probs = self.rng.random(4)
+        scale = 2 ** self.rng.uniform(self.min_scale, self.max_scale)
         scale_x = scale
         scale_y = scale
-        if np.random.rand() < self.stretch_prob:
-            scale_x *= 2 ** np.random.uniform(-self.max_stretch, self.max_stretch)
-            scale_y *= 2 ** np.random.uniform(-self.max_stretch, self.max_stretch)  
-
-        scale_x = np.clip(scale_x, min_scale, None)
-        scale_y = np.clip(scale_y, min_scale, None)
-        
-        valid = (valid.astype(np.float32) > 0.5).astype(bool)
-        if np.random.rand() < self.spatial_aug_prob:
-            # rescale the images
-            img1 = cv2.resize(img1, None, fx=scale_x, fy=scale_y, interpolation=cv2.INTER_LINEAR)
-            img2 = cv2.resize(img2, None, fx=scale_x, fy=scale_y, interpolation=cv2.INTER_LINEAR)
-            flow[~valid] = 0           
-            valid = valid.astype(np.float32)
-            flow = cv2.resize(flow, None, fx=scale_x, fy=scale_y, interpolation=cv2.INTER_LINEAR)
-            valid = cv2.resize(valid, None, fx=scale_x, fy=scale_y, interpolation=cv2.INTER_LINEAR)
-            flow = flow * [scale_x, scale_y] / (valid + 1e-5)[:, :, None]
-            valid = (valid.astype(np.float32) > 0.5).astype(bool)
-            flow[~valid] = 0
-
-        if self.do_flip:
-            if np.random.rand() < self.h_flip_prob: # h-flip
-                img1 = img1[:, ::-1]
-                img2 = img2[:, ::-1]
-                flow = flow[:, ::-1] * [-1.0, 1.0]
-
-            if np.random.rand() < self.v_flip_prob: # v-flip
-                img1 = img1[::-1, :]
-                img2 = img2[::-1, :]
-                flow = flow[::-1, :] * [1.0, -1.0]
-
-        if img1.shape[0] == self.crop_size[0]:
-            y0 = 0
-        else:
-            y0 = np.random.randint(0, img1.shape[0] - self.crop_size[0])
-            
-        if img1.shape[1] == self.crop_size[1]:
-            x0 = 0
+        if probs[0] < self.stretch_prob:
+            scale_x *= 2 ** self.rng.uniform(-self.max_stretch, self.max_stretch)
+            scale_y *= 2 ** self.rng.uniform(-self.max_stretch, self.max_stretch)
+
+        scale_x = float(np.clip(scale_x, min_scale, None))
+        scale_y = float(np.clip(scale_y, min_scale, None))
+
+        do_h_flip = self.do_flip and probs[2] < self.h_flip_prob
+        do_v_flip = self.do_flip and probs[3] < self.v_flip_prob
+
+        params = {
+            'ht': ht, 'wd': wd, 'pad_ht': pad_ht, 'pad_wd': pad_wd,
+            'scale_x': scale_x, 'scale_y': scale_y,
+            'do_h_flip': do_h_flip, 'do_v_flip': do_v_flip,
+            'do_scale': probs[1] < self.spatial_aug_prob,
+        }
+
+        if params['do_scale']:
+            # fuse resize, flip and crop into one warpAffine per array: a
+            # single pass over the source pixels and one crop-sized write
+            new_ht = int(round(pad_ht * scale_y))
+            new_wd = int(round(pad_wd * scale_x))
+            if new_ht == self.crop_size[0]:
+                y0 = 0
+            else:
+                y0 = self.rng.integers(0, new_ht - self.crop_size[0])
+            if new_wd == self.crop_size[1]:
+                x0 = 0
+            else:
+                x0 = self.rng.integers(0, new_wd - self.crop_size[1])
+
+            # resize-style pixel-center alignment: dst = s * src + (s - 1) / 2
+            ax, tx = scale_x, (scale_x - 1) * 0.5
+            ay, ty = scale_y, (scale_y - 1) * 0.5
+            if do_h_flip:
+                ax, tx = -ax, (new_wd - 1) - tx
+            if do_v_flip:
+                ay, ty = -ay, (new_ht - 1) - ty
+            params['M'] = np.array([[ax, 0, tx - x0], [0, ay, ty - y0]], dtype=np.float32)
+            # fold the flip signs into the flow coefficients so the apply
+            # step is free of flip branches
+            params['coef_x'] = -scale_x if do_h_flip else scale_x
+            params['coef_y'] = -scale_y if do_v_flip else scale_y
         else:
-            x0 = np.random.randint(0, img1.shape[1] - self.crop_size[1])
-        
+            # one cv2.flip pass covers h-flip, v-flip and the both-flips case
+            if do_h_flip and do_v_flip:
+                params['flip_code'] = -1
+            elif do_h_flip:
+                params['flip_code'] = 1
+            elif do_v_flip:
+                params['flip_code'] = 0
+            else:
+                params['flip_code'] = None
+
+            if pad_ht == self.crop_size[0]:
+                params['y0'] = 0
+            else:
+                params['y0'] = self.rng.integers(0, pad_ht - self.crop_size[0])
+            if pad_wd == self.crop_size[1]:
+                params['x0'] = 0
+            else:
+                params['x0'] = self.rng.integers(0, pad_wd - self.crop_size[1])
+
+        return params
+
+    def _spatial_transform_images(self, img1, img2, params):
+        """ Image half of the sampled spatial augmentation """
+        if params['do_scale']:
+            return self._warp_images(img1, img2, params)
+        return self._crop_images(img1, img2, params)
+
+    def _warp_images(self, img1, img2, params):
+        """ Straight-line resize+flip+crop of both images via warpAffine """
+        dsize = (self.crop_size[1], self.crop_size[0])
+        out_shape = (self.crop_size[0], self.crop_size[1])
+        img1 = cv2.warpAffine(img1, params['M'], dsize, dst=self._scratch.get('img1', out_shape + (3,), np.uint8),
+                              flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_CONSTANT)
+        img2 = cv2.warpAffine(img2, params['M'], dsize, dst=self._scratch.get('img2', out_shape + (3,), np.uint8),
+                              flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_CONSTANT)
+        return img1, img2
+
+    def _crop_images(self, img1, img2, params):
+        """ No-resize path: pad up to the crop size if needed, flip, crop """
+        pad_ht, pad_wd = params['pad_ht'], params['pad_wd']
+        if pad_ht != params['ht'] or pad_wd != params['wd']:
+            pad_b = pad_ht - params['ht']
+            pad_r = pad_wd - params['wd']
+            img1 = cv2.copyMakeBorder(img1, 0, pad_b, 0, pad_r, cv2.BORDER_CONSTANT,
+                                      dst=self._scratch.get('img1_pad', (pad_ht, pad_wd, 3), np.uint8), value=0)
+            img2 = cv2.copyMakeBorder(img2, 0, pad_b, 0, pad_r, cv2.BORDER_CONSTANT,
+                                      dst=self._scratch.get('img2_pad', (pad_ht, pad_wd, 3), np.uint8), value=0)
+
+        if params['flip_code'] is not None:
+            img1 = cv2.flip(img1, params['flip_code'])
+            img2 = cv2.flip(img2, params['flip_code'])
+
+        y0, x0 = params['y0'], params['x0']
         img1 = img1[y0:y0+self.crop_size[0], x0:x0+self.crop_size[1]]
         img2 = img2[y0:y0+self.crop_size[0], x0:x0+self.crop_size[1]]
+        return img1, img2
+
+    def _spatial_transform_flow(self, flow, valid, params):
+        """ Flow/mask half of the sampled spatial augmentation """
+        # normalize the mask to bool once; it stays bool from here on, with
+        # uint8 views only where OpenCV needs a numeric type
+        if valid.dtype != np.bool_:
+            valid = valid > 0.5
+        if params['do_scale']:
+            return self._warp_flow(flow, valid, params)
+        return self._crop_flow(flow, valid, params)
+
+    def _warp_flow(self, flow, valid, params):
+        """ Straight-line resize+flip+crop+rescale of flow via warpAffine """
+        M = params['M']
+        dsize = (self.crop_size[1], self.crop_size[0])
+        out_shape = (self.crop_size[0], self.crop_size[1])
+        flow[~valid] = 0
+        # split flow into planes: the warps and in-place rescales below
+        # then stream over contiguous rows instead of interleaved XY pairs
+        flow_x, flow_y = cv2.split(flow)
+        # halve flow bandwidth through the warp where the OpenCV build
+        # supports CV_16F; half precision is ample for augmentation-stage
+        # flow and the repack below restores float32 anyway
+        use_fp16 = _cv2_supports_fp16_warp()
+        if use_fp16:
+            flow_x = flow_x.astype(np.float16)
+            flow_y = flow_y.astype(np.float16)
+        # warp the mask as uint8 {0, 255}: 4x less traffic than float32
+        valid_u8 = valid.astype(np.uint8)
+        valid_u8 *= 255
+        flow_x = cv2.warpAffine(flow_x, M, dsize, dst=self._scratch.get('flow_x', out_shape, flow_x.dtype),
+                                flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_CONSTANT)
+        flow_y = cv2.warpAffine(flow_y, M, dsize, dst=self._scratch.get('flow_y', out_shape, flow_y.dtype),
+                                flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_CONSTANT)
+        valid_u8 = cv2.warpAffine(valid_u8, M, dsize, dst=self._scratch.get('valid_u8', out_shape, np.uint8),
+                                  flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_CONSTANT)
+        valid = valid_u8 > 127
+        # fuse the per-axis scale, the flip sign and the divide-by-valid
+        # renormalization into in-place passes with no full-size temporaries
+        denom = self._scratch.get('denom', out_shape, np.float32)
+        np.multiply(valid_u8, np.float32(1.0 / 255.0), out=denom)
+        denom += np.float32(1e-5)
+        flow_x *= params['coef_x']
+        flow_y *= params['coef_y']
+        flow_x /= denom
+        flow_y /= denom
+        flow_x[~valid] = 0
+        flow_y[~valid] = 0
+        # repack to HxWx2 float32 with one strided write per plane
+        flow = np.empty((self.crop_size[0], self.crop_size[1], 2), dtype=np.float32)
+        flow[:, :, 0] = flow_x
+        flow[:, :, 1] = flow_y
+        return flow, valid
+
+    def _crop_flow(self, flow, valid, params):
+        """ Straight-line pad+flip+crop of flow, no resampling """
+        pad_ht, pad_wd = params['pad_ht'], params['pad_wd']
+        if pad_ht != params['ht'] or pad_wd != params['wd']:
+            pad_b = pad_ht - params['ht']
+            pad_r = pad_wd - params['wd']
+            flow = cv2.copyMakeBorder(flow, 0, pad_b, 0, pad_r, cv2.BORDER_CONSTANT, value=0)
+            valid = cv2.copyMakeBorder(valid.view(np.uint8), 0, pad_b, 0, pad_r,
+                                       cv2.BORDER_CONSTANT, value=0).view(bool)
+
+        if params['flip_code'] is not None:
+            flow = cv2.flip(flow, params['flip_code'])
+            valid = cv2.flip(valid.view(np.uint8), params['flip_code']).view(bool)
+            if params['do_h_flip']:
+                flow[:, :, 0] *= -1.0
+            if params['do_v_flip']:
+                flow[:, :, 1] *= -1.0
+
+        y0, x0 = params['y0'], params['x0']
         flow = flow[y0:y0+self.crop_size[0], x0:x0+self.crop_size[1]]
         valid = valid[y0:y0+self.crop_size[0], x0:x0+self.crop_size[1]]
+        return flow, valid
+
+    def spatial_transform(self, img1, img2, flow, valid):
+        params = self._sample_spatial_params(*img1.shape[:2])
+        img1, img2 = self._spatial_transform_images(img1, img2, params)
+        flow, valid = self._spatial_transform_flow(flow, valid, params)
         return img1, img2, flow, valid
 
 
     def __call__(self, img1, img2, flow, valid):
-        img1, img2 = self.color_transform(img1, img2)
-        img1, img2 = self.eraser_transform(img1, img2)
-        img1, img2, flow, valid = self.spatial_transform(img1, img2, flow, valid)
-        img1 = np.ascontiguousarray(img1)
-        img2 = np.ascontiguousarray(img2)
-        flow = np.ascontiguousarray(flow)
-        valid = np.ascontiguousarray(valid)
+        if self.rng is None:
+            self._init_rng()
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=1)
+
+        # draw every numpy-RNG decision on this thread before dispatching;
+        # the Generator is not thread-safe
+        asymmetric = None
+        if not self.gpu_color:
+            asymmetric = self.rng.random() < self.asymmetric_color_aug_prob
+        eraser_boxes = self._sample_eraser_boxes(*img1.shape[:2])
+        params = self._sample_spatial_params(*img1.shape[:2])
+
+        # the photometric ops only touch the images, so they overlap with the
+        # flow/mask half below; cv2, numpy and torch release the GIL in the
+        # hot loops, so the two lanes genuinely run in parallel
+        future = self._pool.submit(self._photometric_transform, img1, img2, asymmetric, eraser_boxes)
+        flow, valid = self._spatial_transform_flow(flow, valid, params)
+        img1, img2 = future.result()
+        img1, img2 = self._spatial_transform_images(img1, img2, params)
+        # hand the dataloader CHW float tensors directly; worker-to-main IPC
+        # already moves torch tensors through shared memory, and the training
+        # loop is spared the permute/cast
+        img1 = torch.from_numpy(np.ascontiguousarray(img1)).permute(2, 0, 1).float()
+        img2 = torch.from_numpy(np.ascontiguousarray(img2)).permute(2, 0, 1).float()
+        flow = torch.from_numpy(np.ascontiguousarray(flow)).permute(2, 0, 1).float()
+        valid = torch.from_numpy(np.ascontiguousarray(valid))
         return img1, img2, flow, valid
@@ -25,54 +25,57 @@ from dataloader.stereo.tartanair import TartanAir
 
 def fetch_dataloader(args, rank=0, world_size=1, use_ddp=False):
     """ Create the data loader for the corresponding trainign set """
+    gpu_color = getattr(args, 'gpu_color', False)
 
     if args.dataset == 'chairs':
-        aug_params = {'crop_size': args.image_size, 'min_scale': args.scale - 0.1, 'max_scale': args.scale + 1.0, 'do_flip': True}
+        aug_params = {'crop_size': args.image_size, 'min_scale': args.scale - 0.1, 'max_scale': args.scale + 1.0, 'do_flip': True, 'gpu_color': gpu_color}
         train_dataset = FlyingChairs(aug_params, split='training')
     
     elif args.dataset == 'things':
-        aug_params = {'crop_size': args.image_size, 'min_scale': args.scale - 0.4, 'max_scale': args.scale + 0.8, 'do_flip': True}
+        aug_params = {'crop_size': args.image_size, 'min_scale': args.scale - 0.4, 'max_scale': args.scale + 0.8, 'do_flip': True, 'gpu_color': gpu_color}
         clean_dataset = FlyingThings3D(aug_params, dstype='frames_cleanpass')
         final_dataset = FlyingThings3D(aug_params, dstype='frames_finalpass')
         train_dataset = clean_dataset + final_dataset
 
     elif args.dataset == 'sintel':
-        aug_params = {'crop_size': args.image_size, 'min_scale': args.scale - 0.2, 'max_scale': args.scale + 0.6, 'do_flip': True}
+        aug_params = {'crop_size': args.image_size, 'min_scale': args.scale - 0.2, 'max_scale': args.scale + 0.6, 'do_flip': True, 'gpu_color': gpu_color}
         sintel_clean = MpiSintel(aug_params, split='training', dstype='clean')
         sintel_final = MpiSintel(aug_params, split='training', dstype='final')
         train_dataset = sintel_clean + sintel_final
 
     elif args.dataset == 'kitti':
-        aug_params = {'crop_size': args.image_size, 'min_scale': args.scale - 0.2, 'max_scale': args.scale + 0.4, 'do_flip': False}
+        aug_params = {'crop_size': args.image_size, 'min_scale': args.scale - 0.2, 'max_scale': args.scale + 0.4, 'do_flip': False, 'gpu_color': gpu_color}
         train_dataset = KITTI(aug_params, split='training')
     
     elif args.dataset == 'spring':
-        aug_params = {'crop_size': args.image_size, 'min_scale': args.scale, 'max_scale': args.scale + 0.2, 'do_flip': True}
+        aug_params = {'crop_size': args.image_size, 'min_scale': args.scale, 'max_scale': args.scale + 0.2, 'do_flip': True, 'gpu_color': gpu_color}
         train_dataset = Spring(aug_params, split='train') + Spring(aug_params, split='val')
 
     elif args.dataset == 'tartanair':
-        aug_params = {'crop_size': args.image_size, 'min_scale': args.scale - 0.2, 'max_scale': args.scale + 0.2, 'do_flip': True}
+        aug_params = {'crop_size': args.image_size, 'min_scale': args.scale - 0.2, 'max_scale': args.scale + 0.2, 'do_flip': True, 'gpu_color': gpu_color}
         train_dataset = TartanAir(aug_params)
 
     elif args.dataset == 'TSKH':
-        aug_params = {'crop_size': args.image_size, 'min_scale': args.scale - 0.4, 'max_scale': args.scale + 0.8, 'do_flip': True}
+        aug_params = {'crop_size': args.image_size, 'min_scale': args.scale - 0.4, 'max_scale': args.scale + 0.8, 'do_flip': True, 'gpu_color': gpu_color}
         things = FlyingThings3D(aug_params, dstype='frames_cleanpass') + FlyingThings3D(aug_params, dstype='frames_finalpass')
-        aug_params = {'crop_size': args.image_size, 'min_scale': args.scale - 0.2, 'max_scale': args.scale + 0.6, 'do_flip': True}
+        aug_params = {'crop_size': args.image_size, 'min_scale': args.scale - 0.2, 'max_scale': args.scale + 0.6, 'do_flip': True, 'gpu_color': gpu_color}
         sintel_clean = MpiSintel(aug_params, split='training', dstype='clean')
         sintel_final = MpiSintel(aug_params, split='training', dstype='final')
-        kitti = KITTI({'crop_size': args.image_size, 'min_scale': args.scale - 0.3, 'max_scale': args.scale + 0.5, 'do_flip': True})
-        hd1k = HD1K({'crop_size': args.image_size, 'min_scale': args.scale - 0.5, 'max_scale': args.scale + 0.2, 'do_flip': True})
+        kitti = KITTI({'crop_size': args.image_size, 'min_scale': args.scale - 0.3, 'max_scale': args.scale + 0.5, 'do_flip': True, 'gpu_color': gpu_color})
+        hd1k = HD1K({'crop_size': args.image_size, 'min_scale': args.scale - 0.5, 'max_scale': args.scale + 0.2, 'do_flip': True, 'gpu_color': gpu_color})
         train_dataset = 20 * sintel_clean + 20 * sintel_final + 80 * kitti + 30 * hd1k + things
 
     if use_ddp:
         train_sampler = torch.utils.data.distributed.DistributedSampler(
             train_dataset, num_replicas=world_size, rank=rank)
         num_gpu = torch.cuda.device_count()
-        train_loader = data.DataLoader(train_dataset, batch_size=args.batch_size // num_gpu, 
-            shuffle=(train_sampler is None), num_workers=calc_num_workers(), sampler=train_sampler)
+        train_loader = data.DataLoader(train_dataset, batch_size=args.batch_size // num_gpu,
+            shuffle=(train_sampler is None), num_workers=calc_num_workers(), sampler=train_sampler,
+            pin_memory=True, persistent_workers=True, prefetch_factor=4)
     else:
-        train_loader = data.DataLoader(train_dataset, batch_size=args.batch_size, 
-            pin_memory=False, shuffle=True, num_workers=32, drop_last=True)
+        train_loader = data.DataLoader(train_dataset, batch_size=args.batch_size,
+            pin_memory=True, shuffle=True, num_workers=32, drop_last=True,
+            persistent_workers=True, prefetch_factor=4)
 
     print('Training with %d image pairs' % len(train_dataset))
     return train_loader
@@ -67,12 +67,13 @@ class FlowDataset(data.Dataset):
             img2 = img2[..., :3]
 
         if self.augmentor is not None:
+            # the augmentor already returns CHW float tensors
             img1, img2, flow, valid = self.augmentor(img1, img2, flow, valid)
-
-        img1 = torch.from_numpy(img1).permute(2, 0, 1).float()
-        img2 = torch.from_numpy(img2).permute(2, 0, 1).float()
-        flow = torch.from_numpy(flow).permute(2, 0, 1).float()
-        valid = torch.from_numpy(valid)
+        else:
+            img1 = torch.from_numpy(img1).permute(2, 0, 1).float()
+            img2 = torch.from_numpy(img2).permute(2, 0, 1).float()
+            flow = torch.from_numpy(flow).permute(2, 0, 1).float()
+            valid = torch.from_numpy(valid)
         valid = (valid >= 0.5) & ((~torch.isnan(flow)).all(dim=0)) & ((~torch.isinf(flow)).all(dim=0))
         flow[torch.isinf(flow)] = 0
         flow[torch.isnan(flow)] = 0
@@ -9,6 +9,7 @@ import torch.optim as optim
 from config.parser import parse_args
 from model import fetch_model
 from dataloader.loader import fetch_dataloader
+from dataloader.augmentor import gpu_color_transform
 from utils.utils import load_ckpt
 from utils.ddp_utils import *
 from criterion.loss import sequence_loss
@@ -73,6 +74,8 @@ def train(args, rank=0, world_size=1, use_ddp=False):
         for i_batch, data_blob in enumerate(train_loader):
             optimizer.zero_grad()
             image1, image2, flow, valid = [x.cuda(non_blocking=True) for x in data_blob]
+            if getattr(args, 'gpu_color', False):
+                image1, image2 = gpu_color_transform(image1, image2)
             output = model(image1, image2, flow_gt=flow)
             loss = sequence_loss(output, flow, valid, args.gamma)
             # logger
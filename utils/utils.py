@@ -4,6 +4,17 @@ import torch.nn.functional as F
 import numpy as np
 from scipy import interpolate
 
+_grid_cache = {}
+
+def pixel_grid(ht, wd):
+    """ Cached (x, y) int32 pixel coordinate grids for a given image size.
+    The returned arrays are shared across calls and must not be written to. """
+    key = (ht, wd)
+    if key not in _grid_cache:
+        _grid_cache[key] = np.meshgrid(
+            np.arange(wd, dtype=np.int32), np.arange(ht, dtype=np.int32), indexing='xy')
+    return _grid_cache[key]
+
 def load_ckpt(model, path):
     """ Load checkpoint """
     state_dict = torch.load(path, map_location=torch.device('cpu'))
@@ -42,7 +53,7 @@ def forward_interpolate(flow):
     dx, dy = flow[0], flow[1]
 
     ht, wd = dx.shape
-    x0, y0 = np.meshgrid(np.arange(wd), np.arange(ht))
+    x0, y0 = pixel_grid(ht, wd)
 
     x1 = x0 + dx
     y1 = y0 + dy
@@ -103,7 +114,7 @@ def from_homog(x):
 
 def reproject(depth1, pose1, pose2, K1, K2):
     H, W = depth1.shape
-    x, y = np.meshgrid(np.arange(W), np.arange(H), indexing='xy')
+    x, y = pixel_grid(H, W)
     img_1_coords = np.stack((x, y, np.ones_like(x)), axis=-1).astype(np.float64)
     cam1_coords = np.einsum('H W, H W j, i j -> H W i', depth1, img_1_coords, np.linalg.inv(K1))
     rel_pose = pose2 @ np.linalg.inv(pose1)
@@ -113,21 +124,19 @@ def reproject(depth1, pose1, pose2, K1, K2):
 def induced_flow(depth0, depth1, data):
     H, W = depth0.shape
     coords1 = reproject(depth0, data['T0'], data['T1'], data['K0'], data['K1'])
-    x, y = np.meshgrid(np.arange(W), np.arange(H), indexing='xy')
+    x, y = pixel_grid(H, W)
     coords0 = np.stack([x, y], axis=-1)
     flow_01 = coords1 - coords0
     H, W = depth1.shape
     coords1 = reproject(depth1, data['T1'], data['T0'], data['K1'], data['K0'])
-    x, y = np.meshgrid(np.arange(W), np.arange(H), indexing='xy')
+    x, y = pixel_grid(H, W)
     coords0 = np.stack([x, y], axis=-1)
     flow_10 = coords1 - coords0
     return flow_01, flow_10
 
 def check_cycle_consistency(flow_01, flow_10):
     H, W = flow_01.shape[:2]
-    new_coords = flow_01 + np.stack(
-        np.meshgrid(np.arange(W), np.arange(H), indexing="xy"), axis=-1
-    )
+    new_coords = flow_01 + np.stack(pixel_grid(H, W), axis=-1)
     flow_reprojected = cv2.remap(
         flow_10, new_coords.astype(np.float32), None, interpolation=cv2.INTER_LINEAR
     )